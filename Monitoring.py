@@ -1,38 +1,152 @@
-import random
 import time
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import tkinter as tk
 from tkinter import ttk, messagebox
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import IsolationForest
 import sqlite3
 import json
+import pathlib
+import atexit
+import collections
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Signes vitaux conservés en mémoire (une colonne NumPy par signe)
+VITAL_SIGNS = ('spo2', 'heart_rate', 'respiratory_rate', 'temperature', 'systolic_bp', 'diastolic_bp')
+# Capacité des tampons circulaires : 24 h à raison d'une mesure toutes les 30 s
+RING_CAPACITY = 2880
+# Seuil du score z robuste au-delà duquel une mesure est considérée anormale
+MAD_THRESHOLD = 3.5
+# Délai minimal entre deux entraînements de l'Isolation Forest (secondes)
+IFOREST_REFIT_INTERVAL = 3600
+# Signes vitaux utilisés pour la détection d'anomalies
+ANOMALY_SIGNS = ('spo2', 'heart_rate', 'respiratory_rate')
+# Isolation Forest : historique d'entraînement, longueur des sous-séquences
+# et écart (en erreurs types) de la moyenne des scores au-delà duquel le modèle est réentraîné
+IFOREST_TRAINING_SIZE = 500
+IFOREST_SUBSEQUENCE = 5
+IFOREST_DRIFT_TOLERANCE = 4.0
+# Niveaux d'activité possibles pour le patient ; seul l'indice est stocké (mémoire et base)
+ACTIVITY_LEVELS = ('repos', 'léger', 'modéré', 'élevé')
+# Champs renvoyés par les capteurs et taille des lots de tirages simulés
+SENSOR_FIELDS = VITAL_SIGNS + ('activity_level',)
+SENSOR_BUFFER_SIZE = 64
+# Symptômes (en minuscules) qui, sévères et associés à une SpO2 basse, signalent une exacerbation
+EXACERBATION_SYMPTOMS = frozenset({'essoufflement', 'toux', 'fatigue', 'dyspnée'})
+# Codes LOINC des signes vitaux exportés vers le DME : (signe vital, code, libellé, unité UCUM)
+EHR_CODES = (
+    ('spo2', '59408-5', 'Oxygen saturation by Pulse oximetry', '%'),
+    ('heart_rate', '8867-4', 'Heart rate', '/min'),
+    ('respiratory_rate', '9279-1', 'Respiratory rate', '/min'),
+    ('temperature', '8310-5', 'Body temperature', 'Cel'),
+    ('systolic_bp', '8480-6', 'Systolic blood pressure', 'mm[Hg]'),
+    ('diastolic_bp', '8462-4', 'Diastolic blood pressure', 'mm[Hg]'),
+)
+# Règles d'alerte : (type = clé du seuil, signe vital, comparaison, message)
+ALERT_RULES = (
+    ('spo2_low', 'spo2', np.less, "SpO2 basse: {:g}%"),
+    ('heart_rate_high', 'heart_rate', np.greater, "Tachycardie: {:g} bpm"),
+    ('respiratory_rate_high', 'respiratory_rate', np.greater, "Tachypnée: {:g} rpm"),
+    ('temperature_high', 'temperature', np.greater, "Fièvre: {:g} °C"),
+)
+# Erreurs propres à une ligne (contrainte violée, valeur non enregistrable) lors d'une écriture
+ROW_ERRORS = (sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.ProgrammingError, OverflowError)
+
+def _sql_timestamp(timestamp):
+    """Convertit un horodatage Unix en secondes entières pour la base, None sinon"""
+    if timestamp is None:
+        return None
+    return int(timestamp)
+
+def _sql_row(*values):
+    """Vérifie qu'une ligne ne contient que des valeurs enregistrables par SQLite"""
+    # L'écriture étant différée, une valeur invalide doit être refusée dès l'appel
+    for value in values:
+        if value is not None and not isinstance(value, (int, float, str, bytes)):
+            raise TypeError(f"Valeur non enregistrable en base: {value!r} ({type(value).__name__})")
+    return values
+
+def _hl7_escape(text):
+    """Échappe les séparateurs HL7 v2 (|^~\\&) dans une valeur de champ"""
+    return (str(text).replace('\\', '\\E\\').replace('|', '\\F\\')
+            .replace('^', '\\S\\').replace('~', '\\R\\').replace('&', '\\T\\'))
 
 class AdvancedPatientMonitor:
+    # Version du schéma (PRAGMA user_version) ; les bases plus anciennes sont migrées à l'ouverture
+    SCHEMA_VERSION = 1
+    # Requêtes d'insertion préparées une seule fois par connexion (cache de sqlite3).
+    # Les lignes sont datées par l'appelant (heure de l'événement, pas de l'écriture
+    # différée) ; sans horodatage explicite (None), SQLite date la ligne lui-même.
+    INSERT_MEAS_SQL = (
+        "INSERT INTO measurements (id, timestamp, spo2, heart_rate, respiratory_rate, temperature, "
+        "systolic_bp, diastolic_bp, activity_level) "
+        "VALUES (?, COALESCE(?, CAST(strftime('%s', 'now') AS INTEGER)), ?, ?, ?, ?, ?, ?, ?)"
+    )
+    INSERT_SYMPTOM_SQL = (
+        "INSERT INTO symptoms (timestamp, symptom, severity, notes) "
+        "VALUES (COALESCE(?, CAST(strftime('%s', 'now') AS INTEGER)), ?, ?, ?)"
+    )
+    INSERT_ALERT_SQL = (
+        "INSERT INTO alerts (timestamp, alert_type, message, severity) "
+        "VALUES (COALESCE(?, CAST(strftime('%s', 'now') AS INTEGER)), ?, ?, ?)"
+    )
+    
     def __init__(self, patient_id, patient_name, config_file="config.json"):
         self.patient_id = patient_id
         self.patient_name = patient_name
         self.config = self.load_config(config_file)
-        self.data = {
-            'timestamp': [],
-            'spo2': [],
-            'heart_rate': [],
-            'respiratory_rate': [],
-            'temperature': [],
-            'systolic_bp': [],
-            'diastolic_bp': [],
-            'symptoms': [],
-            'activity_level': []
-        }
+        # Tampons circulaires préalloués (une colonne par signe vital)
+        self._ring = {name: np.empty(RING_CAPACITY, dtype=np.float64) for name in VITAL_SIGNS}
+        self._ring['timestamp'] = np.empty(RING_CAPACITY, dtype=np.float64)
+        self._ring['activity_level'] = np.empty(RING_CAPACITY, dtype=np.uint8)
+        self._head = 0
+        self._count = 0
+        # Régression de tendance : la fenêtre étant fixe, l'abscisse centrée est précalculée
+        self._w = self.config['prediction_settings']['window_size']
+        self._forecast_hours = self.config['prediction_settings']['forecast_hours']
+        self._xmean = (self._w - 1) / 2
+        self._xcentered = np.arange(self._w) - self._xmean
+        self._xssq = float((self._xcentered ** 2).sum())
+        self._future_x_centered = np.arange(self._w, self._w + self._forecast_hours) - self._xmean
+        self._iforest = None
+        self._iforest_fitted_at = 0.0
+        self._iforest_refitting = False
+        self._deep_iforest = None  # ancien modèle ponctuel (fast=False)
+        self._deep_iforest_fitted_at = 0.0
+        self._rng = np.random.default_rng()
+        self._sensor_buffer = []
         self.symptom_log = []
-        self.alerts = []
+        self.alerts = collections.deque(maxlen=256)  # alertes récentes en mémoire
+        self.alert_count = 0  # nombre total d'alertes depuis le démarrage
+        # Écritures en attente, regroupées par lots pour limiter les commits
+        self._pending_measurements = []
+        self._pending_symptoms = []
+        self._pending_alerts = []
+        self.batch_size = 50  # lignes
+        self.flush_interval = 5.0  # secondes
+        self._last_flush = time.monotonic()
+        # Les commits (et donc les fsync) sont espacés : au plus toutes les commit_interval
+        # secondes, sauf si commit_batch_size lignes attendent d'être validées
+        self.commit_interval = 5.0  # secondes
+        self.commit_batch_size = 100  # lignes
+        self._last_commit = time.monotonic()
+        self._uncommitted = 0
+        # Les écritures sont confiées à un thread dédié pour ne pas bloquer l'interface
+        # (seul flush(), sous le verrou, retire des lignes de la file)
+        self._write_queue = queue.Queue()
+        self._db_lock = threading.RLock()
+        self._writer_wakeup = threading.Event()
+        self._writer_stop = threading.Event()
+        self._email_executor = ThreadPoolExecutor(max_workers=2)
         self.setup_database()
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
+        # Valider les lignes encore en attente si le programme se termine sans close()
+        atexit.register(self.flush, commit=True)
         
     def load_config(self, config_file):
         """Charge la configuration à partir d'un fichier JSON"""
@@ -64,28 +178,65 @@ class AdvancedPatientMonitor:
     
     def setup_database(self):
         """Configure la base de données SQLite"""
-        self.conn = sqlite3.connect(f'patient_{self.patient_id}.db')
+        self.db_path = f'patient_{self.patient_id}.db'
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
         self.cursor = self.conn.cursor()
         
-        # Création des tables
+        # Journal WAL et synchronisation allégée pour des insertions rapides ;
+        # en mode WAL les lecteurs ne bloquent pas l'écriture (et inversement)
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        self.cursor.execute("PRAGMA temp_store=MEMORY")
+        self.cursor.execute("PRAGMA wal_autocheckpoint=1000")
+        self.cursor.execute("PRAGMA mmap_size=268435456")
+        
+        # Version du schéma enregistrée dans le fichier (0 : base antérieure au versionnage)
+        version = self.cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version > self.SCHEMA_VERSION:
+            self.conn.close()
+            raise RuntimeError(
+                f"La base {self.db_path} utilise le schéma {version}, plus récent que celui "
+                f"de ce programme ({self.SCHEMA_VERSION})"
+            )
+        
+        if version < self.SCHEMA_VERSION:
+            self.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            existing = {name for (name,) in self.cursor.fetchall()}
+            with self.conn:
+                self.cursor.execute("BEGIN")
+                if existing & {'measurements', 'symptoms', 'alerts'}:
+                    self._migrate_legacy_schema(existing)
+                else:
+                    self._create_tables()
+                self.cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        
+        # La table des mesures n'a plus de rowid : les identifiants sont attribués ici
+        self.cursor.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM measurements')
+        self._next_measurement_id = self.cursor.fetchone()[0]
+    
+    def _create_tables(self):
+        """Crée les tables du schéma courant"""
+        # Horodatages en secondes Unix. Les mesures sont rangées physiquement par date :
+        # les recherches par plage sont des lectures séquentielles.
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS measurements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME,
+                id INTEGER NOT NULL,
+                timestamp INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
                 spo2 REAL,
                 heart_rate REAL,
                 respiratory_rate REAL,
                 temperature REAL,
                 systolic_bp REAL,
                 diastolic_bp REAL,
-                activity_level TEXT
-            )
+                activity_level INTEGER,  -- indice dans ACTIVITY_LEVELS
+                PRIMARY KEY (timestamp, id)
+            ) WITHOUT ROWID
         ''')
         
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS symptoms (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME,
+                timestamp INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
                 symptom TEXT,
                 severity INTEGER,
                 notes TEXT
@@ -95,23 +246,51 @@ class AdvancedPatientMonitor:
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS alerts (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME,
+                timestamp INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
                 alert_type TEXT,
                 message TEXT,
                 severity TEXT
             )
         ''')
+    
+    def _migrate_legacy_schema(self, existing):
+        """Convertit une base non versionnée (dates en texte local, activité en libellé)"""
+        # Les anciennes tables sont renommées, recréées au schéma courant puis recopiées
+        legacy_tables = [name for name in ('measurements', 'symptoms', 'alerts') if name in existing]
+        for name in legacy_tables:
+            self.cursor.execute(f"ALTER TABLE {name} RENAME TO {name}_legacy")
+        self._create_tables()
         
-        self.conn.commit()
+        # Dates texte (heure locale, format de l'adaptateur datetime de sqlite3) -> secondes Unix UTC
+        epoch = ("CASE WHEN typeof(timestamp) = 'integer' THEN timestamp "
+                 "ELSE CAST(strftime('%s', timestamp, 'utc') AS INTEGER) END")
+        activity = "CASE WHEN typeof(activity_level) = 'integer' THEN activity_level " + "".join(
+            f"WHEN activity_level = '{label}' THEN {index} " for index, label in enumerate(ACTIVITY_LEVELS)
+        ) + "ELSE NULL END"
+        columns = {
+            'measurements': ("id, timestamp, spo2, heart_rate, respiratory_rate, temperature, "
+                             "systolic_bp, diastolic_bp, activity_level",
+                             f"id, {epoch}, spo2, heart_rate, respiratory_rate, temperature, "
+                             f"systolic_bp, diastolic_bp, {activity}"),
+            'symptoms': ("id, timestamp, symptom, severity, notes",
+                         f"id, {epoch}, symptom, severity, notes"),
+            'alerts': ("id, timestamp, alert_type, message, severity",
+                       f"id, {epoch}, alert_type, message, severity"),
+        }
+        for name in legacy_tables:
+            target, source = columns[name]
+            # Les lignes sans date exploitable ne peuvent pas être placées dans le nouveau schéma
+            self.cursor.execute(
+                f"INSERT INTO {name} ({target}) SELECT {source} FROM {name}_legacy "
+                f"WHERE {epoch} IS NOT NULL"
+            )
+            self.cursor.execute(f"DROP TABLE {name}_legacy")
     
-    def save_measurement(self, measurement):
+    def save_measurement(self, measurement, timestamp=None):
         """Enregistre une mesure dans la base de données"""
-        self.cursor.execute('''
-            INSERT INTO measurements 
-            (timestamp, spo2, heart_rate, respiratory_rate, temperature, systolic_bp, diastolic_bp, activity_level)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            measurement['time'],
+        self._enqueue((self._pending_measurements, _sql_row(
+            self._next_measurement_id,
+            _sql_timestamp(timestamp),
             measurement['spo2'],
             measurement['heart_rate'],
             measurement['respiratory_rate'],
@@ -119,32 +298,27 @@ class AdvancedPatientMonitor:
             measurement.get('systolic_bp', 0),
             measurement.get('diastolic_bp', 0),
             measurement['activity_level']
-        ))
-        self.conn.commit()
+        )))
+        self._next_measurement_id += 1
     
-    def save_symptom(self, symptom_entry):
+    def save_symptom(self, symptom_entry, timestamp=None):
         """Enregistre un symptôme dans la base de données"""
-        self.cursor.execute('''
-            INSERT INTO symptoms (timestamp, symptom, severity, notes)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            symptom_entry['timestamp'],
+        self._enqueue((self._pending_symptoms, _sql_row(
+            _sql_timestamp(timestamp),
             symptom_entry['symptom'],
             symptom_entry['severity'],
             symptom_entry['notes']
-        ))
-        self.conn.commit()
+        )))
     
-    def save_alert(self, alert_type, message, severity="medium"):
+    def save_alert(self, alert_type, message, severity="medium", timestamp=None):
         """Enregistre une alerte dans la base de données"""
-        timestamp = datetime.now()
-        self.cursor.execute('''
-            INSERT INTO alerts (timestamp, alert_type, message, severity)
-            VALUES (?, ?, ?, ?)
-        ''', (timestamp, alert_type, message, severity))
-        self.conn.commit()
+        if timestamp is None:
+            timestamp = time.time()
+        self._enqueue((self._pending_alerts,
+                       _sql_row(_sql_timestamp(timestamp), alert_type, message, severity)))
         
         # Ajouter à la liste des alertes en mémoire
+        self.alert_count += 1
         self.alerts.append({
             'timestamp': timestamp,
             'type': alert_type,
@@ -152,6 +326,123 @@ class AdvancedPatientMonitor:
             'severity': severity
         })
     
+    def _enqueue(self, item):
+        """Dépose une ligne à écrire et réveille le thread d'écriture si le lot est plein"""
+        self._write_queue.put(item)
+        if self._write_queue.qsize() >= self.batch_size:
+            self._writer_wakeup.set()
+    
+    def _writer_loop(self):
+        """Vide la file d'écriture en arrière-plan jusqu'à l'arrêt du moniteur"""
+        while not self._writer_stop.is_set():
+            self._writer_wakeup.wait(timeout=self._writer_timeout())
+            self._writer_wakeup.clear()
+            try:
+                with self._db_lock:
+                    self._maybe_flush()
+            except Exception as e:
+                # Le thread doit survivre : les lignes restent en attente pour le prochain essai
+                print(f"❌ Erreur lors de l'écriture en base: {str(e)}")
+                self._writer_stop.wait(self.flush_interval)
+    
+    def _writer_timeout(self):
+        """Délai jusqu'à la prochaine échéance : écriture du lot ou validation en attente"""
+        deadline = self._last_flush + self.flush_interval
+        if self._uncommitted:
+            deadline = min(deadline, self._last_commit + self.commit_interval)
+        return max(0.0, deadline - time.monotonic())
+    
+    def _maybe_flush(self):
+        """Vide les écritures en attente si le lot est plein, trop ancien ou à valider"""
+        pending = (len(self._pending_measurements) + len(self._pending_symptoms)
+                   + len(self._pending_alerts) + self._write_queue.qsize())
+        now = time.monotonic()
+        if (pending >= self.batch_size
+                or now - self._last_flush >= self.flush_interval
+                or (self._uncommitted and now - self._last_commit >= self.commit_interval)):
+            self.flush()
+    
+    def flush(self, commit=False):
+        """Écrit toutes les lignes en attente ; commit=True force la validation immédiate"""
+        with self._db_lock:
+            # Récupérer les lignes encore dans la file pour que les lectures soient à jour ;
+            # la file n'est vidée que sous le verrou, aucune ligne ne peut être « en transit »
+            while True:
+                try:
+                    pending, row = self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                pending.append(row)
+            
+            self._last_flush = time.monotonic()
+            
+            if self._pending_measurements or self._pending_symptoms or self._pending_alerts:
+                batches = ((self.INSERT_MEAS_SQL, self._pending_measurements),
+                           (self.INSERT_SYMPTOM_SQL, self._pending_symptoms),
+                           (self.INSERT_ALERT_SQL, self._pending_alerts))
+                # Le lot est écrit dans un point de sauvegarde, à l'intérieur de la transaction
+                # en cours (un SAVEPOINT hors transaction validerait à sa libération)
+                if not self.conn.in_transaction:
+                    self.conn.execute("BEGIN")
+                self.conn.execute("SAVEPOINT flush")
+                try:
+                    for sql, rows in batches:
+                        self.conn.executemany(sql, rows)
+                    written = sum(len(rows) for _, rows in batches)
+                except ROW_ERRORS:
+                    # Une ligne invalide fait échouer tout le lot : on l'annule et on réécrit
+                    # les lignes une à une en écartant celles qui sont refusées
+                    self.conn.execute("ROLLBACK TO flush")
+                    written = 0
+                    for sql, rows in batches:
+                        for row in rows:
+                            try:
+                                self.conn.execute(sql, row)
+                                written += 1
+                            except ROW_ERRORS as e:
+                                print(f"❌ Ligne ignorée lors de l'écriture en base: {str(e)}")
+                except BaseException:
+                    # Erreur de la base elle-même : les lignes restent en attente pour un nouvel essai
+                    self.conn.execute("ROLLBACK TO flush")
+                    self.conn.execute("RELEASE flush")
+                    raise
+                self.conn.execute("RELEASE flush")
+                self._uncommitted += written
+                self._pending_measurements.clear()
+                self._pending_symptoms.clear()
+                self._pending_alerts.clear()
+            
+            if self._uncommitted and (commit
+                    or self._uncommitted >= self.commit_batch_size
+                    or time.monotonic() - self._last_commit >= self.commit_interval):
+                self.conn.commit()
+                self._uncommitted = 0
+                self._last_commit = time.monotonic()
+    
+    def query(self, sql, params=()):
+        """Exécute une requête de lecture après avoir écrit les données en attente"""
+        reader = self._open_reader()
+        try:
+            return reader.execute(sql, params).fetchall()
+        finally:
+            reader.close()
+    
+    def _open_reader(self):
+        """Valide les écritures en attente et ouvre une connexion en lecture seule"""
+        self.flush(commit=True)
+        # Connexion dédiée : pas de contention avec le thread d'écriture
+        return sqlite3.connect(pathlib.Path(self.db_path).resolve().as_uri() + '?mode=ro', uri=True)
+    
+    def close(self):
+        """Arrête le thread d'écriture, écrit les données en attente et ferme la base"""
+        self._writer_stop.set()
+        self._writer_wakeup.set()
+        self._writer.join()
+        self.flush(commit=True)
+        atexit.unregister(self.flush)
+        self._email_executor.shutdown(wait=True)
+        self.conn.close()
+    
     def connect_sensors(self):
         """Simule la connexion à des capteurs médicaux réels"""
         # Dans une implémentation réelle, ceci se connecterait à des APIs de dispositifs médicaux
@@ -166,60 +457,121 @@ class AdvancedPatientMonitor:
         # - Moniteurs de signes vitaux
         # - Dispositifs portables (smartwatches)
         
-        spo2 = random.randint(88, 99)
-        heart_rate = random.randint(60, 120)
-        respiratory_rate = random.randint(12, 30)
-        temperature = round(random.uniform(36.0, 38.5), 1)
-        systolic_bp = random.randint(100, 160)
-        diastolic_bp = random.randint(60, 100)
-        activity_level = random.choice(['repos', 'léger', 'modéré', 'élevé'])
+        # Les tirages sont faits par lots vectorisés puis consommés un à un
+        if not self._sensor_buffer:
+            batch = self._draw_vitals(SENSOR_BUFFER_SIZE)
+            columns = [batch[key].tolist() for key in SENSOR_FIELDS]
+            self._sensor_buffer = [dict(zip(SENSOR_FIELDS, row)) for row in zip(*columns)]
         
+        return self._sensor_buffer.pop()
+    
+    def _draw_vitals(self, n):
+        """Tire n jeux de signes vitaux simulés en une seule passe NumPy"""
         return {
-            'spo2': spo2,
-            'heart_rate': heart_rate,
-            'respiratory_rate': respiratory_rate,
-            'temperature': temperature,
-            'systolic_bp': systolic_bp,
-            'diastolic_bp': diastolic_bp,
-            'activity_level': activity_level
+            'spo2': self._rng.integers(88, 100, n),
+            'heart_rate': self._rng.integers(60, 121, n),
+            'respiratory_rate': self._rng.integers(12, 31, n),
+            'temperature': self._rng.uniform(36.0, 38.5, n).round(1),
+            'systolic_bp': self._rng.integers(100, 161, n),
+            'diastolic_bp': self._rng.integers(60, 101, n),
+            'activity_level': self._rng.integers(0, len(ACTIVITY_LEVELS), n)
         }
     
+    def simulate_batch(self, n, interval=30):
+        """Simule n mesures espacées de interval secondes et se terminant maintenant"""
+        batch = self._draw_vitals(n)
+        batch['timestamp'] = time.time() - interval * np.arange(n - 1, -1, -1)
+        
+        # Ajouter aux données en mémoire (seules les RING_CAPACITY dernières sont conservées)
+        kept = min(n, RING_CAPACITY)
+        positions = (self._head + np.arange(kept)) % RING_CAPACITY
+        for name in ('timestamp', 'activity_level') + VITAL_SIGNS:
+            self._ring[name][positions] = batch[name][n - kept:]
+        self._head = (self._head + kept) % RING_CAPACITY
+        self._count = min(self._count + kept, RING_CAPACITY)
+        
+        # Sauvegarder dans la base de données en une seule transaction
+        with self._db_lock:
+            ids = range(self._next_measurement_id, self._next_measurement_id + n)
+            self._next_measurement_id += n
+            self._pending_measurements.extend(zip(
+                ids,
+                [_sql_timestamp(t) for t in batch['timestamp'].tolist()],
+                *(batch[name].tolist() for name in VITAL_SIGNS),
+                batch['activity_level'].tolist()
+            ))
+            self.flush()
+        
+        return batch
+    
     def simulate_measurement(self):
         """Simule une lecture de capteurs avec des valeurs réalistes"""
         measurement = self.read_sensor_data()
         
         # Enregistrement avec horodatage
-        current_time = datetime.now()
+        current_time = time.time()
         measurement['time'] = current_time
         
         # Ajouter aux données en mémoire
-        self.data['timestamp'].append(current_time)
-        self.data['spo2'].append(measurement['spo2'])
-        self.data['heart_rate'].append(measurement['heart_rate'])
-        self.data['respiratory_rate'].append(measurement['respiratory_rate'])
-        self.data['temperature'].append(measurement['temperature'])
-        self.data['systolic_bp'].append(measurement['systolic_bp'])
-        self.data['diastolic_bp'].append(measurement['diastolic_bp'])
-        self.data['activity_level'].append(measurement['activity_level'])
+        self._ring['timestamp'][self._head] = current_time
+        for name in VITAL_SIGNS:
+            self._ring[name][self._head] = measurement[name]
+        self._ring['activity_level'][self._head] = measurement['activity_level']
+        self._head = (self._head + 1) % RING_CAPACITY
+        self._count = min(self._count + 1, RING_CAPACITY)
         
         # Sauvegarder dans la base de données
-        self.save_measurement(measurement)
+        self.save_measurement(measurement, timestamp=current_time)
         
         return measurement
     
+    def _window(self, name, n):
+        """Retourne les n dernières valeurs d'une colonne, de la plus ancienne à la plus récente"""
+        n = min(n, self._count)
+        column = self._ring[name]
+        start = self._head - n
+        if start >= 0:
+            return column[start:self._head]
+        return np.concatenate((column[start:], column[:self._head]))
+    
+    def scan_thresholds(self, start=0, end=None):
+        """Recherche en une passe les dépassements de seuils : liste de (horodatage, type, message)"""
+        # Les positions sont chronologiques : 0 désigne la plus ancienne mesure en mémoire
+        thresholds = self.config['alert_thresholds']
+        columns = [self._window(name, self._count)[start:end] for _, name, _, _ in ALERT_RULES]
+        masks = [
+            compare(column, thresholds[alert_type])
+            for (alert_type, _, compare, _), column in zip(ALERT_RULES, columns)
+        ]
+        idx = np.flatnonzero(np.logical_or.reduce(masks))
+        timestamps = self._window('timestamp', self._count)[start:end]
+        
+        violations = []
+        for i in idx:
+            for (alert_type, _, _, template), column, mask in zip(ALERT_RULES, columns, masks):
+                if mask[i]:
+                    violations.append((timestamps[i], alert_type, template.format(column[i])))
+        return violations
+    
+    def replay_alerts(self, start=0, end=None):
+        """Rejoue la détection d'alertes sur l'historique et enregistre les dépassements"""
+        violations = self.scan_thresholds(start, end)
+        for timestamp, alert_type, message in violations:
+            self.save_alert(alert_type, message, timestamp=timestamp)
+        return len(violations)
+    
     def log_symptom(self, symptom, severity, notes=""):
         """Enregistre un symptôme dans le journal"""
         entry = {
-            'timestamp': datetime.now(),
+            'timestamp': time.time(),
             'symptom': symptom,
             'severity': severity,  # 1-10
             'notes': notes
         }
         self.symptom_log.append(entry)
-        self.data['symptoms'].append(f"{symptom} (severity: {severity})")
         
         # Sauvegarder dans la base de données
-        self.save_symptom(entry)
+        self.save_symptom(entry, timestamp=entry['timestamp'])
         
         # Vérification des exacerbations potentielles
         self.check_exacerbation(entry)
@@ -229,11 +581,11 @@ class AdvancedPatientMonitor:
     def check_exacerbation(self, symptom_entry):
         """Vérifie les signes d'exacerbation"""
         # Dernières mesures
-        if len(self.data['spo2']) > 0:
-            latest_spo2 = self.data['spo2'][-1]
+        if self._count > 0:
+            latest_spo2 = self._ring['spo2'][self._head - 1]
             
             # Alertes basées sur les symptômes et la SpO2
-            if (symptom_entry['symptom'].lower() in ['essoufflement', 'toux', 'fatigue'] and 
+            if (symptom_entry['symptom'].casefold() in EXACERBATION_SYMPTOMS and 
                 symptom_entry['severity'] >= 7 and latest_spo2 < 92):
                 self.send_alert("exacerbation", "Signes d'exacerbation possible")
                 return True
@@ -249,9 +601,9 @@ class AdvancedPatientMonitor:
         # Afficher dans la console
         print(f"🔴 ALERTE: {message} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         
-        # Envoyer par email si configuré
+        # Envoyer par email si configuré (en arrière-plan, l'échange SMTP est bloquant)
         if self.config['email_alerts']['enabled']:
-            self.send_email_alert(message, severity)
+            self._email_executor.submit(self.send_email_alert, message, severity)
         
         # Dans une application réelle, on pourrait aussi envoyer un SMS ici
     
@@ -295,116 +647,248 @@ class AdvancedPatientMonitor:
     
     def predict_deterioration(self, hours=6):
         """Prédit une détérioration potentielle basée sur les données historiques"""
-        if len(self.data['spo2']) < self.config['prediction_settings']['window_size']:
+        if self._count < self._w:
             return "Données insuffisantes pour la prédiction"
         
         # Préparer les données pour la prédiction
-        window_size = self.config['prediction_settings']['window_size']
-        spo2_data = self.data['spo2'][-window_size:]
+        spo2_data = self._window('spo2', self._w)
         
-        # Créer un modèle de régression linéaire simple
-        X = np.arange(len(spo2_data)).reshape(-1, 1)
-        y = np.array(spo2_data)
-        
-        model = LinearRegression()
-        model.fit(X, y)
+        # Régression linéaire simple par moindres carrés (forme fermée)
+        y_mean = spo2_data.mean()
+        slope = (self._xcentered * (spo2_data - y_mean)).sum() / self._xssq
         
         # Prédire les prochaines heures
-        future_X = np.arange(len(spo2_data), len(spo2_data) + hours).reshape(-1, 1)
-        predictions = model.predict(future_X)
+        if hours == self._forecast_hours:
+            future_x_centered = self._future_x_centered
+        else:
+            future_x_centered = np.arange(self._w, self._w + hours) - self._xmean
+        predictions = y_mean + slope * future_x_centered
         
         # Vérifier si une détérioration est prévue
-        if any(pred < self.config['alert_thresholds']['spo2_low'] for pred in predictions):
+        if np.any(predictions < self.config['alert_thresholds']['spo2_low']):
             return f"Détérioration prévue dans les {hours} heures. SpO2 pourrait descendre sous {self.config['alert_thresholds']['spo2_low']}%"
         
         return "Aucune détérioration significative prévue"
     
-    def detect_anomalies(self):
+    def detect_anomalies(self, deep=False, fast=True):
         """Détecte les anomalies dans les données vitales"""
-        if len(self.data['spo2']) < 10:
+        if self._count < 10:
             return "Données insuffisantes pour la détection d'anomalies"
         
         # Préparer les données
-        vital_data = np.array([
-            self.data['spo2'][-10:],
-            self.data['heart_rate'][-10:],
-            self.data['respiratory_rate'][-10:]
-        ]).T
-        
-        # Entraîner un modèle de détection d'anomalies
-        model = IsolationForest(contamination=0.1)
-        model.fit(vital_data)
+        vital_data = np.column_stack([self._window(name, 10) for name in ANOMALY_SIGNS])
         
-        # Prédire les anomalies
-        predictions = model.predict(vital_data)
+        if deep and fast:
+            # Isolation Forest sur fenêtres glissantes : seules les 10 dernières sont évaluées
+            if self._count < IFOREST_TRAINING_SIZE:
+                return "Données insuffisantes pour la détection d'anomalies"
+            model, baseline_mean, baseline_std = self._anomaly_model()
+            scores = model.score_samples(self._subsequences(10 + IFOREST_SUBSEQUENCE - 1))
+            anomalous = scores < model.offset_
+            
+            # Dérive de la moyenne des scores : on réentraîne le modèle en arrière-plan
+            # (un écart-type quasi nul, sur des données constantes, ne permet pas de juger)
+            if (baseline_std > 1e-9 and abs(scores.mean() - baseline_mean)
+                    > IFOREST_DRIFT_TOLERANCE * baseline_std / np.sqrt(len(scores))):
+                self._refit_anomaly_model()
+        elif deep:
+            # Ancienne méthode : Isolation Forest ponctuelle entraînée sur tout l'historique
+            anomalous = self._deep_anomaly_model().predict(vital_data) == -1
+        else:
+            # Score z robuste basé sur l'écart absolu médian (MAD)
+            median = np.median(vital_data, axis=0)
+            deviation = np.abs(vital_data - median)
+            mad = np.median(deviation, axis=0)
+            # MAD nulle (fréquent sur des valeurs entières) : repli sur l'écart absolu moyen ;
+            # si lui aussi est nul, tout écart non nul est considéré anormal
+            scale = np.where(mad > 0, mad / 0.6745, 1.2533 * deviation.mean(axis=0))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = np.where(deviation > 0, deviation / scale, 0.0)
+            anomalous = np.any(scores > MAD_THRESHOLD, axis=1)
         
         # Compter les anomalies
-        anomaly_count = sum(predictions == -1)
+        anomaly_count = int(anomalous.sum())
         
         if anomaly_count > 2:
             return f"{anomaly_count} anomalies détectées dans les signes vitaux"
         
         return "Aucune anomalie détectée"
     
+    def _deep_anomaly_model(self):
+        """Retourne l'Isolation Forest ponctuelle, réentraînée au plus une fois par heure"""
+        if (self._deep_iforest is None
+                or time.monotonic() - self._deep_iforest_fitted_at >= IFOREST_REFIT_INTERVAL):
+            from sklearn.ensemble import IsolationForest
+            
+            history = np.column_stack([self._window(name, self._count) for name in ANOMALY_SIGNS])
+            self._deep_iforest = IsolationForest(contamination=0.1)
+            self._deep_iforest.fit(history)
+            self._deep_iforest_fitted_at = time.monotonic()
+        return self._deep_iforest
+    
+    def _subsequences(self, n):
+        """Découpe les n dernières mesures en sous-séquences chevauchantes aplaties"""
+        vital_data = np.column_stack([self._window(name, n) for name in ANOMALY_SIGNS])
+        windows = np.lib.stride_tricks.sliding_window_view(vital_data, IFOREST_SUBSEQUENCE, axis=0)
+        return windows.reshape(len(windows), -1)
+    
+    def _anomaly_model(self):
+        """Retourne l'Isolation Forest courante, réentraînée au plus une fois par heure"""
+        if self._iforest is None:
+            self._fit_anomaly_model(self._subsequences(IFOREST_TRAINING_SIZE))
+        elif time.monotonic() - self._iforest_fitted_at >= IFOREST_REFIT_INTERVAL:
+            self._refit_anomaly_model()
+        return self._iforest
+    
+    def _refit_anomaly_model(self):
+        """Lance un réentraînement en arrière-plan ; l'ancien modèle reste utilisé d'ici là"""
+        if self._iforest_refitting:
+            return
+        self._iforest_refitting = True
+        training = self._subsequences(IFOREST_TRAINING_SIZE)
+        threading.Thread(target=self._background_fit, args=(training,), daemon=True).start()
+    
+    def _background_fit(self, training):
+        """Réentraîne le modèle dans un thread ; une erreur est signalée sans bloquer les suivants"""
+        try:
+            self._fit_anomaly_model(training)
+        except Exception as e:
+            print(f"❌ Erreur lors du réentraînement de l'Isolation Forest: {str(e)}")
+    
+    def _fit_anomaly_model(self, training):
+        """Entraîne l'Isolation Forest et mémorise la distribution de ses scores"""
+        # Import différé : scikit-learn n'est chargé qu'à la première analyse approfondie
+        from sklearn.ensemble import IsolationForest
+        
+        try:
+            model = IsolationForest(n_estimators=50, max_samples=256, contamination=0.1)
+            model.fit(training)
+            scores = model.score_samples(training)
+            self._iforest = (model, scores.mean(), scores.std())
+            self._iforest_fitted_at = time.monotonic()
+        finally:
+            self._iforest_refitting = False
+    
     def generate_comprehensive_report(self, hours=24):
         """Génère un rapport complet avec prédictions et analyses"""
-        # Récupérer les données de la base de données
-        query = f"""
-        SELECT * FROM measurements 
-        WHERE timestamp >= datetime('now', '-{hours} hours')
-        ORDER BY timestamp
-        """
-        df = pd.read_sql_query(query, self.conn)
+        # Calculer les statistiques directement dans SQLite
+        spo2_low = self.config['alert_thresholds']['spo2_low']
+        stats = self.query("""
+            SELECT COUNT(*), AVG(spo2), AVG(heart_rate), AVG(respiratory_rate), AVG(temperature),
+                   AVG(systolic_bp), AVG(diastolic_bp), MIN(spo2), MAX(spo2), MAX(heart_rate),
+                   MAX(respiratory_rate), SUM(CASE WHEN spo2 < ? THEN 1 ELSE 0 END)
+            FROM measurements
+            WHERE timestamp >= ?
+        """, (spo2_low, int(time.time()) - hours * 3600))[0]
+        (count, avg_spo2, avg_hr, avg_rr, avg_temp, avg_sys, avg_dia,
+         min_spo2, max_spo2, max_hr, max_rr, desat_ct) = stats
         
-        if df.empty:
+        if count == 0:
             return "Aucune donnée disponible pour cette période"
         
+        prediction = self.predict_deterioration()
+        anomalies = self.detect_anomalies()
+        
         # Générer des statistiques
-        report = f"""
+        return f"""
 📊 RAPPORT COMPLET - {self.patient_name}
 Période: {hours} heures
 ----------------------------------------
 Valeurs moyennes:
-- SpO2: {df['spo2'].mean():.1f}%
-- Fréquence cardiaque: {df['heart_rate'].mean():.1f} bpm
-- Fréquence respiratoire: {df['respiratory_rate'].mean():.1f} rpm
-- Température: {df['temperature'].mean():.1f} °C
-- Pression artérielle: {df['systolic_bp'].mean():.1f}/{df['diastolic_bp'].mean():.1f} mmHg
+- SpO2: {avg_spo2:.1f}%
+- Fréquence cardiaque: {avg_hr:.1f} bpm
+- Fréquence respiratoire: {avg_rr:.1f} rpm
+- Température: {avg_temp:.1f} °C
+- Pression artérielle: {avg_sys:.1f}/{avg_dia:.1f} mmHg
 
 Valeurs extrêmes:
-- SpO2 min: {df['spo2'].min()}%
-- SpO2 max: {df['spo2'].max()}%
-- FC max: {df['heart_rate'].max()} bpm
-- FR max: {df['respiratory_rate'].max()} rpm
+- SpO2 min: {min_spo2}%
+- SpO2 max: {max_spo2}%
+- FC max: {max_hr} bpm
+- FR max: {max_rr} rpm
 
-Épisodes de désaturation (SpO2 < {self.config['alert_thresholds']['spo2_low']}%): {len(df[df['spo2'] < self.config['alert_thresholds']['spo2_low']])}
+Épisodes de désaturation (SpO2 < {spo2_low}%): {desat_ct}
 
 Analyse de prédiction:
-{self.predict_deterioration()}
+{prediction}
 
 Détection d'anomalies:
-{self.detect_anomalies()}
+{anomalies}
         """
-        
-        return report
     
-    def export_to_ehr(self, format='hl7'):
-        """Exporte les données vers un format compatible avec les DME"""
-        # Cette fonction simulerait l'exportation vers un système de dossier médical électronique
-        # En pratique, cela utiliserait des standards comme HL7 FHIR
+    def export_to_ehr(self, format='hl7', hours=24):
+        """Exporte les mesures vers un format compatible avec les DME, un message par mesure
         
-        print(f"Exportation des données au format {format.upper()} pour intégration DME...")
-        # Simulation d'exportation
-        time.sleep(2)
-        print("Données exportées avec succès")
-        
-        return True
+        Retourne un itérateur (et non plus True) : rien n'est exporté tant que l'appelant ne
+        le parcourt pas. Un format non supporté lève ValueError dès l'appel.
+        """
+        formatters = {'hl7': self.format_hl7_message, 'fhir': self.format_fhir_observation}
+        if format not in formatters:
+            raise ValueError(f"Format d'exportation non supporté: {format}")
+        return self._export_messages(formatters[format], hours)
+    
+    def _export_messages(self, formatter, hours):
+        """Génère les messages au fil du curseur : la mémoire reste constante quel que soit le volume"""
+        reader = self._open_reader()
+        try:
+            rows = reader.execute(
+                "SELECT id, timestamp, " + ", ".join(name for name, _, _, _ in EHR_CODES)
+                + " FROM measurements WHERE timestamp >= ? ORDER BY timestamp",
+                (int(time.time()) - hours * 3600,)
+            )
+            for row in rows:
+                yield formatter(row)
+        finally:
+            reader.close()
+    
+    def format_hl7_message(self, row):
+        """Construit un message HL7 v2.5 ORU^R01 pour une ligne de mesures"""
+        measurement_id, timestamp = row[0], row[1]
+        hl7_time = time.strftime('%Y%m%d%H%M%S', time.gmtime(timestamp)) + '+0000'
+        given_name, _, family_name = self.patient_name.rpartition(' ')
+        segments = [
+            f"MSH|^~\\&|MONITORING||DME||{hl7_time}||ORU^R01|{measurement_id}|P|2.5",
+            f"PID|||{_hl7_escape(self.patient_id)}||{_hl7_escape(family_name)}^{_hl7_escape(given_name)}",
+            f"OBR|1||{measurement_id}|85353-1^Vital signs panel^LN|||{hl7_time}",
+        ]
+        segments.extend(
+            f"OBX|{i}|NM|{code}^{label}^LN||{value}|{unit}|||||F"
+            for i, ((_, code, label, unit), value) in enumerate(zip(EHR_CODES, row[2:]), start=1)
+        )
+        return "\r".join(segments)
+    
+    def format_fhir_observation(self, row):
+        """Construit une ressource FHIR Observation (JSON) pour une ligne de mesures"""
+        measurement_id, timestamp = row[0], row[1]
+        observation = {
+            'resourceType': 'Observation',
+            'id': str(measurement_id),
+            'status': 'final',
+            'category': [{'coding': [{
+                'system': 'http://terminology.hl7.org/CodeSystem/observation-category',
+                'code': 'vital-signs'
+            }]}],
+            'code': {'coding': [{'system': 'http://loinc.org', 'code': '85353-1',
+                                 'display': 'Vital signs panel'}]},
+            'subject': {'reference': f'Patient/{self.patient_id}', 'display': self.patient_name},
+            'effectiveDateTime': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp)),
+            'component': [
+                {
+                    'code': {'coding': [{'system': 'http://loinc.org', 'code': code, 'display': label}]},
+                    'valueQuantity': {'value': value, 'unit': unit,
+                                      'system': 'http://unitsofmeasure.org', 'code': unit}
+                }
+                for (_, code, label, unit), value in zip(EHR_CODES, row[2:])
+            ]
+        }
+        return json.dumps(observation, ensure_ascii=False)
 
 class MonitoringGUI:
     def __init__(self, monitor):
         self.monitor = monitor
         self.root = tk.Tk()
         self.root.title(f"Système de Surveillance - {monitor.patient_name}")
+        self._pending_display = None  # textes en attente d'affichage
         self.setup_gui()
         
     def setup_gui(self):
@@ -423,12 +907,14 @@ class MonitoringGUI:
         self.rr_var = tk.StringVar(value="FR: -- rpm")
         self.temp_var = tk.StringVar(value="Temp: -- °C")
         self.bp_var = tk.StringVar(value="PA: --/-- mmHg")
+        self.activity_var = tk.StringVar(value="Activité: --")
         
         ttk.Label(main_frame, textvariable=self.spo2_var, font=('Arial', 12)).grid(row=1, column=0, sticky=tk.W, pady=5)
         ttk.Label(main_frame, textvariable=self.hr_var, font=('Arial', 12)).grid(row=2, column=0, sticky=tk.W, pady=5)
         ttk.Label(main_frame, textvariable=self.rr_var, font=('Arial', 12)).grid(row=3, column=0, sticky=tk.W, pady=5)
         ttk.Label(main_frame, textvariable=self.temp_var, font=('Arial', 12)).grid(row=1, column=1, sticky=tk.W, pady=5)
         ttk.Label(main_frame, textvariable=self.bp_var, font=('Arial', 12)).grid(row=2, column=1, sticky=tk.W, pady=5)
+        ttk.Label(main_frame, textvariable=self.activity_var, font=('Arial', 12)).grid(row=3, column=1, sticky=tk.W, pady=5)
         
         # Boutons
         ttk.Button(main_frame, text="Nouvelle Mesure", command=self.take_measurement).grid(row=4, column=0, pady=10)
@@ -441,6 +927,7 @@ class MonitoringGUI:
         self.alert_text.grid(row=6, column=0, columnspan=2, pady=10)
         self.alert_text.insert(tk.END, "Aucune alerte pour le moment\n")
         self.alert_text.config(state=tk.DISABLED)
+        self._last_alert_count = 0
         
         # Configuration de la mise à jour automatique
         self.update_interval = 30000  # 30 secondes
@@ -456,43 +943,57 @@ class MonitoringGUI:
     
     def update_display_values(self, measurement):
         """Met à jour l'affichage avec les nouvelles valeurs"""
-        self.spo2_var.set(f"SpO2: {measurement['spo2']}%")
-        self.hr_var.set(f"FC: {measurement['heart_rate']} bpm")
-        self.rr_var.set(f"FR: {measurement['respiratory_rate']} rpm")
-        self.temp_var.set(f"Temp: {measurement['temperature']} °C")
-        self.bp_var.set(f"PA: {measurement['systolic_bp']}/{measurement['diastolic_bp']} mmHg")
+        # Les textes sont appliqués ensemble au prochain passage inactif de Tk
+        scheduled = self._pending_display is not None
+        self._pending_display = [
+            (self.spo2_var, f"SpO2: {measurement['spo2']}%"),
+            (self.hr_var, f"FC: {measurement['heart_rate']} bpm"),
+            (self.rr_var, f"FR: {measurement['respiratory_rate']} rpm"),
+            (self.temp_var, f"Temp: {measurement['temperature']} °C"),
+            (self.bp_var, f"PA: {measurement['systolic_bp']}/{measurement['diastolic_bp']} mmHg"),
+            (self.activity_var, f"Activité: {ACTIVITY_LEVELS[measurement['activity_level']]}")
+        ]
+        if not scheduled:
+            self.root.after_idle(self._apply_display_values)
+    
+    def _apply_display_values(self):
+        """Applique en une seule passe les derniers textes en attente"""
+        for var, text in self._pending_display:
+            var.set(text)
+        self._pending_display = None
     
     def check_measurement_alerts(self, measurement):
         """Vérifie si la mesure déclenche des alertes"""
         thresholds = self.monitor.config['alert_thresholds']
         
-        if measurement['spo2'] < thresholds['spo2_low']:
-            self.monitor.send_alert("spo2_low", f"SpO2 basse: {measurement['spo2']}%")
-        
-        if measurement['heart_rate'] > thresholds['heart_rate_high']:
-            self.monitor.send_alert("heart_rate_high", f"Tachycardie: {measurement['heart_rate']} bpm")
-        
-        if measurement['respiratory_rate'] > thresholds['respiratory_rate_high']:
-            self.monitor.send_alert("respiratory_rate_high", f"Tachypnée: {measurement['respiratory_rate']} rpm")
-        
-        if measurement['temperature'] > thresholds['temperature_high']:
-            self.monitor.send_alert("temperature_high", f"Fièvre: {measurement['temperature']} °C")
+        # Mêmes règles que le rejeu vectorisé (scan_thresholds), appliquées à une seule mesure
+        for alert_type, name, compare, template in ALERT_RULES:
+            if compare(measurement[name], thresholds[alert_type]):
+                self.monitor.send_alert(alert_type, template.format(measurement[name]))
         
         self.update_alert_display()
     
     def update_alert_display(self):
         """Met à jour l'affichage des alertes"""
+        new_count = self.monitor.alert_count - self._last_alert_count
+        if new_count == 0:
+            return
+        
         self.alert_text.config(state=tk.NORMAL)
-        self.alert_text.delete(1.0, tk.END)
+        if self._last_alert_count == 0:
+            self.alert_text.delete(1.0, tk.END)
         
-        if not self.monitor.alerts:
-            self.alert_text.insert(tk.END, "Aucune alerte pour le moment\n")
-        else:
-            for alert in self.monitor.alerts[-5:]:  # Afficher les 5 dernières alertes
-                self.alert_text.insert(tk.END, 
-                    f"{alert['timestamp'].strftime('%H:%M:%S')} - {alert['message']}\n")
+        # Ajouter uniquement les nouvelles alertes puis ne garder que les 5 dernières lignes
+        for i in range(min(new_count, 5), 0, -1):
+            alert = self.monitor.alerts[-i]
+            self.alert_text.insert(tk.END, 
+                f"{time.strftime('%H:%M:%S', time.localtime(alert['timestamp']))} - {alert['message']}\n")
+        line_count = int(self.alert_text.index('end-1c').split('.')[0]) - 1
+        if line_count > 5:
+            self.alert_text.delete(1.0, f"{line_count - 4}.0")
         
         self.alert_text.config(state=tk.DISABLED)
+        self._last_alert_count = self.monitor.alert_count
     
     def show_report(self):
         """Affiche un rapport complet"""
@@ -511,10 +1012,13 @@ class MonitoringGUI:
         log_window.title("Journal des Symptômes")
         
         # Récupérer les symptômes de la base de données
-        query = "SELECT timestamp, symptom, severity, notes FROM symptoms ORDER BY timestamp DESC LIMIT 20"
-        df = pd.read_sql_query(query, self.monitor.conn)
+        query = (
+            "SELECT datetime(timestamp, 'unixepoch', 'localtime'), symptom, severity, notes FROM symptoms "
+            "ORDER BY timestamp DESC LIMIT 20"
+        )
+        rows = self.monitor.query(query)
         
-        if df.empty:
+        if not rows:
             text_area = tk.Text(log_window, width=80, height=10)
             text_area.pack(padx=10, pady=10)
             text_area.insert(tk.END, "Aucun symptôme enregistré")
@@ -528,13 +1032,8 @@ class MonitoringGUI:
         tree.heading('Sévérité', text='Sévérité')
         tree.heading('Notes', text='Notes')
         
-        for _, row in df.iterrows():
-            tree.insert('', tk.END, values=(
-                row['timestamp'],
-                row['symptom'],
-                row['severity'],
-                row['notes']
-            ))
+        for row in rows:
+            tree.insert('', tk.END, values=row)
         
         tree.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
     
@@ -544,10 +1043,13 @@ class MonitoringGUI:
         alert_window.title("Historique des Alertes")
         
         # Récupérer les alertes de la base de données
-        query = "SELECT timestamp, alert_type, message, severity FROM alerts ORDER BY timestamp DESC"
-        df = pd.read_sql_query(query, self.monitor.conn)
+        query = (
+            "SELECT datetime(timestamp, 'unixepoch', 'localtime'), alert_type, message, severity FROM alerts "
+            "ORDER BY timestamp DESC"
+        )
+        rows = self.monitor.query(query)
         
-        if df.empty:
+        if not rows:
             text_area = tk.Text(alert_window, width=80, height=10)
             text_area.pack(padx=10, pady=10)
             text_area.insert(tk.END, "Aucune alerte enregistrée")
@@ -561,24 +1063,23 @@ class MonitoringGUI:
         tree.heading('Message', text='Message')
         tree.heading('Sévérité', text='Sévérité')
         
-        for _, row in df.iterrows():
-            tree.insert('', tk.END, values=(
-                row['timestamp'],
-                row['alert_type'],
-                row['message'],
-                row['severity']
-            ))
+        for row in rows:
+            tree.insert('', tk.END, values=row)
         
         tree.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
     
     def update_display(self):
         """Met à jour périodiquement l'affichage"""
         self.take_measurement()
-        self.root.after(self.update_interval, self.update_display)
+        # La mesure suivante n'est lancée que lorsque Tk a fini de redessiner
+        self.root.after(self.update_interval, lambda: self.root.after_idle(self.update_display))
     
     def run(self):
         """Lance l'interface graphique"""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.monitor.close()
 
 # Exemple d'utilisation
 if __name__ == "__main__":